@@ -3,48 +3,83 @@ Vercel Serverless Function - Main API endpoint
 """
 
 from flask import Flask, render_template, jsonify, request
-import yfinance as yf
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import os
+import sys
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.data_fetcher import NSEDataFetcher, QUOTE_TTL, fetch_charts
+from src.json_provider import use_fast_json, conditional_jsonify
 
 app = Flask(__name__, template_folder='../templates')
+use_fast_json(app)
+
+# Number of signals kept in memory and returned by /api/status
+SIGNALS_HISTORY_SIZE = 100
+STATUS_SIGNALS_LIMIT = 20
+
+# Seconds before /api/status triggers a background refresh of the snapshot
+REFRESH_AFTER = 30
+_refresh_lock = threading.Lock()
 
 # In-memory storage (resets on cold start)
 data_store = {
     "previous_high": None,
     "previous_low": None,
     "previous_close": None,
-    "signals_history": []
+    "signals_history": deque(maxlen=SIGNALS_HISTORY_SIZE),
+    # Last fetched market snapshot, filled at cold start by the pre-warm thread
+    "market_data": None,
+    "market_data_ts": 0.0,
+    "market_data_at": None
 }
 
 
+# [epoch second, "%Y-%m-%d %H:%M:%S" string, ISO string] for the current second
+_TS_CACHE = [0, "", ""]
+
+
+def now_str():
+    """Return (display, iso) strings for now, formatted at most once per second"""
+    t = int(time.time())
+    if t != _TS_CACHE[0]:
+        dt = datetime.fromtimestamp(t)
+        _TS_CACHE[:] = [t, dt.strftime("%Y-%m-%d %H:%M:%S"), dt.isoformat()]
+    return _TS_CACHE[1], _TS_CACHE[2]
+
+
 def get_banknifty_data():
-    """Fetch BankNifty data from Yahoo Finance"""
+    """Fetch previous-day and current BankNifty data from one Yahoo chart request"""
     try:
-        ticker = yf.Ticker("^NSEBANK")
-        hist = ticker.history(period="5d")
+        symbol = NSEDataFetcher.BANKNIFTY_SYMBOL
+        bars = fetch_charts([symbol], "5d", ttl=QUOTE_TTL)[symbol]
 
-        if hist.empty:
+        if not bars:
             return None, None
 
-        # Get previous day data (second to last row)
-        if len(hist) >= 2:
-            prev_day = hist.iloc[-2]
-            current = hist.iloc[-1]
+        # Get previous day data (second to last bar)
+        if len(bars["close"]) >= 2:
+            prev_close = bars["close"][-2]
+            prev_date = datetime.fromtimestamp(bars["timestamp"][-2] + bars["gmtoffset"], timezone.utc)
 
             prev_data = {
-                "high": float(prev_day["High"]),
-                "low": float(prev_day["Low"]),
-                "close": float(prev_day["Close"]),
-                "date": str(prev_day.name.date())
+                "high": bars["high"][-2],
+                "low": bars["low"][-2],
+                "close": prev_close,
+                "date": str(prev_date.date())
             }
 
             current_data = {
-                "price": float(current["Close"]),
-                "open": float(current["Open"]),
-                "high": float(current["High"]),
-                "low": float(current["Low"]),
-                "change": round(((current["Close"] - prev_day["Close"]) / prev_day["Close"]) * 100, 2),
+                "price": bars["close"][-1],
+                "open": bars["open"][-1],
+                "high": bars["high"][-1],
+                "low": bars["low"][-1],
+                "change": round(((bars["close"][-1] - prev_close) / prev_close) * 100, 2),
                 "timestamp": datetime.now().isoformat()
             }
 
@@ -57,6 +92,50 @@ def get_banknifty_data():
         return None, None
 
 
+def refresh_market_data():
+    """Fetch BankNifty data and store it as the current snapshot"""
+    prev_data, current_data = get_banknifty_data()
+    if current_data:
+        data_store["market_data"] = (prev_data, current_data)
+        data_store["market_data_ts"] = time.monotonic()
+        data_store["market_data_at"] = now_str()[0]
+    return prev_data, current_data
+
+
+def _refresh_worker():
+    """Background refresh; releases the lock taken by _refresh_async"""
+    try:
+        refresh_market_data()
+    finally:
+        _refresh_lock.release()
+
+
+def _refresh_async():
+    """Start a background refresh unless one is already running"""
+    if _refresh_lock.acquire(blocking=False):
+        threading.Thread(target=_refresh_worker, daemon=True).start()
+
+
+def get_market_data():
+    """
+    Return the stored snapshot immediately, kicking off a background refresh
+    when it is older than REFRESH_AFTER seconds. Only the very first call
+    (no snapshot yet) blocks on the network.
+    """
+    if not data_store["market_data"]:
+        return refresh_market_data()
+
+    if time.monotonic() - data_store["market_data_ts"] > REFRESH_AFTER:
+        _refresh_async()
+    return data_store["market_data"]
+
+
+def recent_signals(limit=STATUS_SIGNALS_LIMIT):
+    """Return the newest signals (oldest first) as a JSON-ready list"""
+    history = data_store["signals_history"]
+    return list(islice(history, max(0, len(history) - limit), None))
+
+
 def check_signal(current_price, prev_high, prev_low):
     """Check for breakout signals"""
     if current_price > prev_high:
@@ -75,7 +154,7 @@ def index():
 @app.route('/api/status')
 def get_status():
     """Get current market status"""
-    prev_data, current_data = get_banknifty_data()
+    prev_data, current_data = get_market_data()
 
     # Use fetched data or stored manual data
     if prev_data:
@@ -87,14 +166,14 @@ def get_status():
         prev_low = data_store["previous_low"]
         prev_close = data_store["previous_close"]
     else:
-        return jsonify({
+        return conditional_jsonify({
             "scanner_running": True,
-            "last_scan": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "last_scan": now_str()[0],
             "current_price": None,
             "market_status": {},
             "previous_day_data": None,
             "email_configured": False,
-            "signals_history": data_store["signals_history"]
+            "signals_history": recent_signals()
         })
 
     current_price = current_data["price"] if current_data else None
@@ -113,9 +192,10 @@ def get_status():
             "previous_day_date": prev_data["date"] if prev_data else "manual"
         }
 
-    return jsonify({
+    # last_scan is the snapshot time, so the ETag only changes with the data
+    return conditional_jsonify({
         "scanner_running": True,
-        "last_scan": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "last_scan": data_store["market_data_at"] or now_str()[0],
         "current_price": current_data,
         "market_status": market_status,
         "previous_day_data": {
@@ -124,14 +204,14 @@ def get_status():
             "close": prev_close
         },
         "email_configured": bool(os.getenv("EMAIL_SENDER")),
-        "signals_history": data_store["signals_history"][-20:]
+        "signals_history": recent_signals()
     })
 
 
 @app.route('/api/scan', methods=['POST'])
 def manual_scan():
     """Trigger a manual scan"""
-    prev_data, current_data = get_banknifty_data()
+    prev_data, current_data = refresh_market_data()
 
     if not current_data:
         return jsonify({"success": False, "message": "Could not fetch data"})
@@ -142,23 +222,39 @@ def manual_scan():
     signal_type, trigger = check_signal(current_data["price"], prev_high, prev_low)
 
     if signal_type != "NEUTRAL":
+        history = data_store["signals_history"]
+        last = history[-1] if history else None
+
+        # A breakout is identified by its side and trigger level: repeated
+        # scans above the same level report the recorded signal instead of
+        # appending a new one on every poll
+        if last and (last["signal_type"], last["trigger_level"]) == (signal_type, trigger):
+            return jsonify({
+                "success": True,
+                "message": f"{signal_type} signal at {last['price']:,.2f} already recorded",
+                "signal": last,
+                "duplicate": True
+            })
+
         signal = {
             "signal_type": signal_type,
             "price": current_data["price"],
             "trigger_level": trigger,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_str()[1]
         }
-        data_store["signals_history"].append(signal)
+        history.append(signal)
         return jsonify({
             "success": True,
             "message": f"{signal_type} signal at {current_data['price']:,.2f}",
-            "signal": signal
+            "signal": signal,
+            "duplicate": False
         })
 
     return jsonify({
         "success": True,
         "message": f"No signal. Price {current_data['price']:,.2f} within range.",
-        "signal": None
+        "signal": None,
+        "duplicate": False
     })
 
 
@@ -174,7 +270,11 @@ def set_data():
     return jsonify({
         "success": True,
         "message": "Data updated successfully",
-        "data": data_store
+        "data": {
+            "previous_high": data_store["previous_high"],
+            "previous_low": data_store["previous_low"],
+            "previous_close": data_store["previous_close"]
+        }
     })
 
 
@@ -187,6 +287,11 @@ def test_email():
     })
 
 
+# Pre-warm the market snapshot while the rest of the cold start completes
+if os.getenv("PREWARM_MARKET_DATA", "1") == "1":
+    threading.Thread(target=refresh_market_data, daemon=True).start()
+
+
 # Vercel serverless handler
 def handler(request):
     return app(request)
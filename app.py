@@ -11,11 +11,12 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from src.scanner import BankNiftyScanner
-from src.email_alert import EmailAlertSystem
 from src.value_scanner import scan_stocks, NSE_STOCKS
+from src.json_provider import use_fast_json, conditional_jsonify
 
 # Initialize Flask app
 app = Flask(__name__)
+use_fast_json(app)
 
 # Initialize scanner with 15-minute interval
 SCAN_INTERVAL = int(os.getenv("SCAN_INTERVAL_MINUTES", "15"))
@@ -41,7 +42,7 @@ def value_buy():
 @app.route("/api/status")
 def get_status():
     """Get current scanner status and market data"""
-    return jsonify(scanner.get_status())
+    return conditional_jsonify(scanner.get_status())
 
 
 @app.route("/api/scan", methods=["POST"])
@@ -67,9 +68,9 @@ def manual_scan():
 @app.route("/api/test-email", methods=["POST"])
 def test_email():
     """Send a test email"""
-    email_system = EmailAlertSystem()
+    email_system = scanner.email_alert
 
-    if not email_system.is_configured():
+    if not email_system.configured:
         return jsonify({
             "success": False,
             "message": "Email not configured. Please set EMAIL_SENDER, EMAIL_PASSWORD, and EMAIL_RECEIVER in environment variables."
@@ -92,7 +93,7 @@ def test_email():
 def get_signals():
     """Get signals history"""
     status = scanner.get_status()
-    return jsonify({
+    return conditional_jsonify({
         "signals": status.get("signals_history", [])
     })
 
@@ -164,6 +165,7 @@ def update_price():
 
     # Update scanner's current price data
     from datetime import datetime
+    now = datetime.now()
     prev_data = scanner.signal_generator.previous_day_data or {}
     scanner.current_price_data = {
         "price": price,
@@ -171,22 +173,22 @@ def update_price():
         "high": prev_data.get("high", 0),
         "low": prev_data.get("low", 0),
         "change": 0,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": now.isoformat()
     }
 
     # Check for signals
-    signal = scanner.signal_generator.check_signal(price)
+    signal = scanner.signal_generator.check_signal(price, now)
     signal_data = None
     if signal:
         signal_data = signal.to_dict()
         # Send email if configured
-        if scanner.email_alert.is_configured():
-            scanner.email_alert.send_signal_alert(
+        if scanner.email_alert.configured:
+            scanner.email_alert.send_signal_alert_async(
                 signal_type=signal.signal_type,
                 price=signal.price,
                 trigger_level=signal.trigger_level,
-                prev_high=signal.previous_day_high,
-                prev_low=signal.previous_day_low
+                prev_high=signal.swing_high,
+                prev_low=signal.swing_low
             )
 
     return jsonify({
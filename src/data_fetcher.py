@@ -3,17 +3,255 @@ BankNifty Data Fetcher - Fetches daily OHLC data from NSE India with yfinance fa
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 from datetime import datetime, timedelta
 import time
 import os
 import json
+import hashlib
+import threading
+import functools
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 try:
-    import yfinance as yf
-    YFINANCE_AVAILABLE = True
+    import orjson
+    ORJSON_AVAILABLE = True
 except ImportError:
-    YFINANCE_AVAILABLE = False
+    ORJSON_AVAILABLE = False
+
+try:
+    from requests_cache import CachedSession, DO_NOT_CACHE
+    REQUESTS_CACHE_AVAILABLE = True
+except ImportError:
+    REQUESTS_CACHE_AVAILABLE = False
+
+# Cache lifetimes (seconds). Daily history still carries today's in-progress
+# bar, so it is only held for one scan interval rather than the whole day.
+QUOTE_TTL = 60
+HISTORY_TTL = 15 * 60
+NSE_HISTORY_TTL = 12 * 60 * 60
+VALIDATOR_TTL = 24 * 60 * 60
+COOKIE_TTL = 10 * 60
+
+# On-disk cache location (Vercel only allows writes under /tmp)
+CACHE_DIR = os.getenv("CACHE_DIR") or (
+    "/tmp/francis-cache" if os.getenv("VERCEL")
+    else os.path.join(os.path.dirname(__file__), "..", ".cache")
+)
+
+# Process-wide caches shared by every fetcher and the serverless API
+_TICKERS = {}
+_TICKER_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+_FETCH_LOCKS = defaultdict(threading.Lock)
+
+YAHOO_CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart"
+MAX_CHART_WORKERS = 20
+# Keep-alive connections held for Yahoo. Sized for the value scanner's
+# widest fan-out (15 symbols x 3 timeframes); requests beyond the pool
+# size open throwaway connections and pay a fresh TLS handshake each.
+YAHOO_POOL_SIZE = 45
+
+
+def _mount_pool(session, pool_maxsize=10):
+    """Mount a keep-alive connection pool with short retries on a session"""
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=pool_maxsize,
+        max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504])
+    )
+    session.mount("https://", adapter)
+    return session
+
+
+YAHOO_SESSION = _mount_pool(requests.Session(), pool_maxsize=YAHOO_POOL_SIZE)
+YAHOO_SESSION.headers.update({
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
+})
+
+
+@functools.cache
+def _yf():
+    """
+    Import yfinance on first use (it pulls in a large dependency tree, so
+    keep it off the cold-start path). Returns None if not installed.
+    """
+    try:
+        import yfinance
+        return yfinance
+    except ImportError:
+        return None
+
+
+def yf_ticker(symbol):
+    """Return a memoized yfinance Ticker for symbol"""
+    with _CACHE_LOCK:
+        ticker = _TICKERS.get(symbol)
+        if ticker is None:
+            ticker = _TICKERS[symbol] = _yf().Ticker(symbol)
+        return ticker
+
+
+def ttl_cached(key, ttl, loader):
+    """
+    Return loader() through the process-wide cache, reusing a value while it
+    is younger than ttl seconds. Concurrent misses for the same key wait for a
+    single fetch instead of all hitting Yahoo. Empty results are not cached.
+    """
+    with _CACHE_LOCK:
+        fetch_lock = _FETCH_LOCKS[key]
+
+    with fetch_lock:
+        entry = _TICKER_CACHE.get(key)
+        if entry is not None and time.monotonic() - entry[0] < ttl:
+            return entry[1]
+
+        value = loader()
+        if value is not None and len(value) > 0:
+            _TICKER_CACHE[key] = (time.monotonic(), value)
+        return value
+
+
+def cached_history(symbol, period, ttl=QUOTE_TTL):
+    """Return ticker.history(period=...) for symbol through the TTL cache"""
+    return ttl_cached(
+        ("history", symbol, period), ttl,
+        lambda: yf_ticker(symbol).history(period=period)
+    )
+
+
+def fetch_chart(symbol, range_period="5d", interval="1d"):
+    """
+    Fetch OHLC bars from Yahoo's chart API as plain lists (no DataFrame).
+    Returns dict with timestamp/open/high/low/close lists, or None.
+    """
+    url = f"{YAHOO_CHART_URL}/{symbol}"
+    params = {"range": range_period, "interval": interval}
+    response = YAHOO_SESSION.get(url, params=params, timeout=10)
+    if response.status_code != 200:
+        return None
+
+    result = json_loads(response.content).get("chart", {}).get("result") or []
+    if not result:
+        return None
+
+    result = result[0]
+    timestamps = result.get("timestamp") or []
+    quote = (result.get("indicators", {}).get("quote") or [{}])[0]
+
+    bars = {"timestamp": [], "open": [], "high": [], "low": [], "close": []}
+    for row in zip(timestamps, quote.get("open", []), quote.get("high", []),
+                   quote.get("low", []), quote.get("close", [])):
+        # Yahoo pads missing bars with nulls
+        if None in row:
+            continue
+        for key, value in zip(bars, row):
+            bars[key].append(value)
+
+    if not bars["timestamp"]:
+        return None
+
+    bars["gmtoffset"] = result.get("meta", {}).get("gmtoffset", 0)
+    return bars
+
+
+def cached_chart(symbol, range_period="5d", interval="1d", ttl=QUOTE_TTL):
+    """
+    Return fetch_chart(...) through the TTL cache. Misses check the file
+    cache before hitting Yahoo, so a fresh serverless instance can reuse bars
+    fetched by the previous one.
+    """
+    key = ("chart", symbol, range_period, interval)
+
+    def load():
+        bars = _cache_get(key, ttl)
+        if bars is None:
+            bars = fetch_chart(symbol, range_period, interval)
+            if bars:
+                _cache_set(key, bars)
+        return bars
+
+    return ttl_cached(key, ttl, load)
+
+
+def fetch_charts(symbols, range_period="5d", interval="1d", ttl=QUOTE_TTL):
+    """
+    Fetch chart bars for several symbols at once, returning {symbol: bars}.
+    Cache misses are requested concurrently over the shared keep-alive
+    session, so N symbols cost roughly one round trip instead of N.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if len(symbols) == 1:
+        return {symbols[0]: cached_chart(symbols[0], range_period, interval, ttl)}
+
+    workers = min(MAX_CHART_WORKERS, len(symbols)) or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(
+            lambda symbol: cached_chart(symbol, range_period, interval, ttl), symbols
+        )
+        return dict(zip(symbols, results))
+
+
+def _json_dumps(obj):
+    """Serialize obj to JSON bytes (orjson when installed)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+
+def json_loads(data):
+    """Parse JSON bytes (orjson when installed)"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _frame_to_records(df):
+    """Convert an OHLC DataFrame to JSON-safe records"""
+    return df.assign(Date=df["Date"].dt.strftime("%Y-%m-%dT%H:%M:%S")).to_dict("records")
+
+
+def _records_to_frame(records):
+    """Rebuild an OHLC DataFrame from _frame_to_records output"""
+    df = pd.DataFrame(records)
+    df["Date"] = pd.to_datetime(df["Date"])
+    return df
+
+
+def _cache_path(key):
+    """File path for a cache key (hashed, so any tuple of params works)"""
+    digest = hashlib.md5(repr(key).encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"{digest}.json")
+
+
+def _cache_get(key, ttl):
+    """Return the cached value for key if younger than ttl seconds, else None"""
+    try:
+        with open(_cache_path(key), "rb") as f:
+            entry = json_loads(f.read())
+        if time.time() - entry["ts"] < ttl:
+            return entry["data"]
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Error reading cache: {e}")
+    return None
+
+
+def _cache_set(key, value):
+    """Write value to the file cache for key"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = _cache_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_json_dumps({"ts": time.time(), "data": value}))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Error writing cache: {e}")
 
 
 class NSEDataFetcher:
@@ -24,7 +262,7 @@ class NSEDataFetcher:
     DATA_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "banknifty_data.json")
 
     def __init__(self):
-        self.session = requests.Session()
+        self.session = self._create_session()
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             "Accept": "application/json, text/plain, */*",
@@ -37,14 +275,61 @@ class NSEDataFetcher:
         self._cached_data = None
         self._cache_time = None
         self._manual_data = None
+        self._cookie_ts = 0.0
         self._load_saved_data()
 
+    def _create_session(self):
+        """Create the NSE HTTP session, cached on disk when requests-cache is installed"""
+        if not REQUESTS_CACHE_AVAILABLE:
+            return _mount_pool(requests.Session())
+
+        return _mount_pool(CachedSession(
+            os.path.join(CACHE_DIR, "nse"),
+            backend="sqlite",
+            expire_after=QUOTE_TTL,
+            urls_expire_after={
+                # First match wins; the home page is only hit for its cookies,
+                # so it is never served from cache
+                f"{self.BASE_URL}/api/historical/*": NSE_HISTORY_TTL,
+                f"{self.BASE_URL}/api/*": QUOTE_TTL,
+                self.BASE_URL: DO_NOT_CACHE,
+            },
+            allowable_methods=("GET",),
+        ))
+
+    def _ensure_cookies(self):
+        """Visit the NSE home page for session cookies unless we got them recently"""
+        if self.session.cookies and time.monotonic() - self._cookie_ts < COOKIE_TTL:
+            return
+
+        self.session.get(self.BASE_URL, timeout=10)
+        self._cookie_ts = time.monotonic()
+
+    def _nse_get(self, url, params=None, headers=None):
+        """
+        GET an NSE API endpoint. A cached response is returned straight away;
+        otherwise session cookies are refreshed first if they are stale.
+        """
+        if REQUESTS_CACHE_AVAILABLE:
+            response = self.session.get(url, params=params, timeout=15, only_if_cached=True)
+            if response.status_code == 200:
+                return response
+
+        self._ensure_cookies()
+        response = self.session.get(url, params=params, headers=headers, timeout=15)
+        if response.status_code in (401, 403):
+            # Cookies were rejected; fetch fresh ones and retry once
+            self._cookie_ts = 0.0
+            self._ensure_cookies()
+            response = self.session.get(url, params=params, headers=headers, timeout=15)
+        return response
+
     def _load_saved_data(self):
         """Load saved data from file"""
         try:
             if os.path.exists(self.DATA_FILE):
-                with open(self.DATA_FILE, "r") as f:
-                    self._manual_data = json.load(f)
+                with open(self.DATA_FILE, "rb") as f:
+                    self._manual_data = json_loads(f.read())
         except Exception as e:
             print(f"Error loading saved data: {e}")
 
@@ -52,8 +337,8 @@ class NSEDataFetcher:
         """Save data to file"""
         try:
             os.makedirs(os.path.dirname(self.DATA_FILE), exist_ok=True)
-            with open(self.DATA_FILE, "w") as f:
-                json.dump(data, f)
+            with open(self.DATA_FILE, "wb") as f:
+                f.write(_json_dumps(data))
         except Exception as e:
             print(f"Error saving data: {e}")
 
@@ -78,60 +363,77 @@ class NSEDataFetcher:
         self._manual_data["price_updated_at"] = datetime.now().isoformat()
         self._save_data(self._manual_data)
 
+    def get_manual_previous_day(self):
+        """
+        Return the manually set previous day as a plain OHLC dict
+        (same keys as a get_banknifty_data row), or None if not set
+        """
+        if not (self._manual_data and "previous_high" in self._manual_data):
+            return None
+
+        prev_close = self._manual_data.get("previous_close", 0)
+        return {
+            "Date": datetime.now() - timedelta(days=1),
+            "Open": prev_close,
+            "High": self._manual_data["previous_high"],
+            "Low": self._manual_data["previous_low"],
+            "Close": prev_close
+        }
+
     def get_banknifty_data(self, days=30):
         """
         Fetch BankNifty historical daily data
         Returns DataFrame with Date, Open, High, Low, Close columns
         """
         # Check if we have manual data
-        if self._manual_data and "previous_high" in self._manual_data:
-            yesterday = datetime.now() - timedelta(days=1)
-            df = pd.DataFrame([{
-                "Date": yesterday,
-                "Open": self._manual_data.get("previous_close", 0),
-                "High": self._manual_data["previous_high"],
-                "Low": self._manual_data["previous_low"],
-                "Close": self._manual_data.get("previous_close", 0)
-            }])
+        manual_day = self.get_manual_previous_day()
+        if manual_day:
+            return pd.DataFrame([manual_day])
+
+        # yfinance first: its daily history includes today's in-progress bar,
+        # which callers rely on (iloc[-2] is the previous session and the
+        # swing finder treats the last row as today). NSE's indicesHistory is
+        # end-of-day only, so it is strictly a fallback.
+        df = self._fetch_yfinance(days)
+        if df is not None and not df.empty:
             return df
 
-        # Try yfinance first (more reliable)
-        if YFINANCE_AVAILABLE:
-            df = self._fetch_yfinance(days)
-            if df is not None and not df.empty:
-                return df
-
-        # Fallback to NSE direct
         return self._fetch_nse(days)
 
     def _fetch_yfinance(self, days=30):
         """Fetch data using yfinance"""
+        cache_key = ("yfinance", self.BANKNIFTY_SYMBOL, days)
+        cached = _cache_get(cache_key, HISTORY_TTL)
+        if cached:
+            return _records_to_frame(cached)
+
+        if _yf() is None:
+            return None
+
         try:
-            ticker = yf.Ticker(self.BANKNIFTY_SYMBOL)
-            df = ticker.history(period=f"{days}d")
+            hist = cached_history(self.BANKNIFTY_SYMBOL, f"{days}d", ttl=HISTORY_TTL)
 
-            if df.empty:
+            if hist.empty:
                 return None
 
-            df = df.reset_index()
-            df = df.rename(columns={
-                "Date": "Date",
-                "Open": "Open",
-                "High": "High",
-                "Low": "Low",
-                "Close": "Close"
+            # yfinance returns bars sorted by a (timezone-aware) Date index,
+            # so build the frame in one go without rename/sort copies
+            dates = hist.index
+            if dates.tz is not None:
+                dates = dates.tz_localize(None)
+
+            df = pd.DataFrame({
+                "Date": dates,
+                "Open": hist["Open"].to_numpy(),
+                "High": hist["High"].to_numpy(),
+                "Low": hist["Low"].to_numpy(),
+                "Close": hist["Close"].to_numpy()
             })
 
-            # Handle timezone-aware datetime
-            if df["Date"].dt.tz is not None:
-                df["Date"] = df["Date"].dt.tz_localize(None)
-
-            df = df[["Date", "Open", "High", "Low", "Close"]]
-            df = df.sort_values("Date").reset_index(drop=True)
-
             # Cache the data
             self._cached_data = df
             self._cache_time = datetime.now()
+            _cache_set(cache_key, _frame_to_records(df))
 
             return df
 
@@ -141,11 +443,12 @@ class NSEDataFetcher:
 
     def _fetch_nse(self, days=30):
         """Fetch data from NSE India directly"""
-        try:
-            # Initialize session
-            self.session.get(self.BASE_URL, timeout=10)
-            time.sleep(1)
+        cache_key = ("nse", "NIFTY BANK", days)
+        cached = _cache_get(cache_key, NSE_HISTORY_TTL)
+        if cached:
+            return _records_to_frame(cached)
 
+        try:
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
 
@@ -156,30 +459,53 @@ class NSEDataFetcher:
                 "to": end_date.strftime("%d-%m-%Y")
             }
 
-            response = self.session.get(hist_url, params=params, timeout=15)
-
-            if response.status_code == 200:
-                data = response.json()
-                if "data" in data and "indexCloseOnlineRecords" in data["data"]:
-                    records = data["data"]["indexCloseOnlineRecords"]
-                    df = pd.DataFrame(records)
-
-                    df = df.rename(columns={
-                        "EOD_TIMESTAMP": "Date",
-                        "EOD_OPEN_INDEX_VAL": "Open",
-                        "EOD_HIGH_INDEX_VAL": "High",
-                        "EOD_LOW_INDEX_VAL": "Low",
-                        "EOD_CLOSE_INDEX_VAL": "Close"
+            # Replay the validators of the last full response so unchanged
+            # EOD history comes back as a bodyless 304
+            validators_key = ("nse-validators", hist_url, params["from"], params["to"])
+            validators = _cache_get(validators_key, VALIDATOR_TTL) or {}
+            conditional_headers = {}
+            if validators.get("etag"):
+                conditional_headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                conditional_headers["If-Modified-Since"] = validators["last_modified"]
+
+            response = self._nse_get(hist_url, params=params, headers=conditional_headers)
+
+            data = None
+            if response.status_code == 304 and "body" in validators:
+                data = validators["body"]
+            elif response.status_code == 200:
+                data = json_loads(response.content)
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+                if etag or last_modified:
+                    _cache_set(validators_key, {
+                        "etag": etag,
+                        "last_modified": last_modified,
+                        "body": data
                     })
 
-                    df = df[["Date", "Open", "High", "Low", "Close"]]
-                    df["Date"] = pd.to_datetime(df["Date"], format="%d-%b-%Y")
-                    df = df.sort_values("Date").reset_index(drop=True)
+            if data and "data" in data and "indexCloseOnlineRecords" in data["data"]:
+                records = data["data"]["indexCloseOnlineRecords"]
+                df = pd.DataFrame(records)
+
+                df = df.rename(columns={
+                    "EOD_TIMESTAMP": "Date",
+                    "EOD_OPEN_INDEX_VAL": "Open",
+                    "EOD_HIGH_INDEX_VAL": "High",
+                    "EOD_LOW_INDEX_VAL": "Low",
+                    "EOD_CLOSE_INDEX_VAL": "Close"
+                })
 
-                    for col in ["Open", "High", "Low", "Close"]:
-                        df[col] = pd.to_numeric(df[col], errors="coerce")
+                df = df[["Date", "Open", "High", "Low", "Close"]]
+                df["Date"] = pd.to_datetime(df["Date"], format="%d-%b-%Y")
+                df = df.sort_values("Date").reset_index(drop=True)
 
-                    return df
+                price_cols = ["Open", "High", "Low", "Close"]
+                df[price_cols] = df[price_cols].apply(pd.to_numeric, errors="coerce")
+
+                _cache_set(cache_key, _frame_to_records(df))
+                return df
 
             return pd.DataFrame()
 
@@ -201,61 +527,60 @@ class NSEDataFetcher:
                 "source": "manual"
             }
 
-        # Try yfinance first
-        if YFINANCE_AVAILABLE:
-            price_data = self._get_price_yfinance()
-            if price_data:
-                return price_data
+        # Try Yahoo first
+        price_data = self._get_price_yahoo()
+        if price_data:
+            return price_data
 
         # Fallback to NSE
         return self._get_price_nse()
 
-    def _get_price_yfinance(self):
-        """Get current price using yfinance"""
-        try:
-            ticker = yf.Ticker(self.BANKNIFTY_SYMBOL)
+    def _get_price_yahoo(self):
+        """Get current price from Yahoo's chart API"""
+        cache_key = ("price", self.BANKNIFTY_SYMBOL)
+        cached = _cache_get(cache_key, QUOTE_TTL)
+        if cached:
+            return cached
 
-            # Get today's data
-            hist = ticker.history(period="2d")
+        try:
+            bars = cached_chart(self.BANKNIFTY_SYMBOL, "2d", ttl=QUOTE_TTL)
 
-            if hist.empty:
+            if not bars:
                 return None
 
-            # Get latest data
-            latest = hist.iloc[-1]
+            close = bars["close"][-1]
 
             # Calculate change from previous close if we have 2 days
-            if len(hist) >= 2:
-                prev_close = hist.iloc[-2]["Close"]
-                change = ((latest["Close"] - prev_close) / prev_close) * 100
+            if len(bars["close"]) >= 2:
+                prev_close = bars["close"][-2]
+                change = ((close - prev_close) / prev_close) * 100
             else:
                 change = 0
 
-            return {
-                "price": float(latest["Close"]),
-                "open": float(latest["Open"]),
-                "high": float(latest["High"]),
-                "low": float(latest["Low"]),
+            price_data = {
+                "price": close,
+                "open": bars["open"][-1],
+                "high": bars["high"][-1],
+                "low": bars["low"][-1],
                 "change": round(change, 2),
                 "timestamp": datetime.now().isoformat(),
-                "source": "yfinance"
+                "source": "yahoo"
             }
+            _cache_set(cache_key, price_data)
+            return price_data
 
         except Exception as e:
-            print(f"yfinance price error: {e}")
+            print(f"Yahoo price error: {e}")
             return None
 
     def _get_price_nse(self):
         """Get current price from NSE"""
         try:
-            self.session.get(self.BASE_URL, timeout=10)
-            time.sleep(0.5)
-
             url = f"{self.BASE_URL}/api/allIndices"
-            response = self.session.get(url, timeout=15)
+            response = self._nse_get(url)
 
             if response.status_code == 200:
-                data = response.json()
+                data = json_loads(response.content)
                 for index in data.get("data", []):
                     if index.get("index") == "NIFTY BANK":
                         return {
@@ -274,6 +599,17 @@ class NSEDataFetcher:
             return None
 
 
+# Shared fetcher so every caller reuses one connection pool and cookie jar
+@functools.cache
+def get_default_fetcher():
+    """
+    Return the process-wide NSEDataFetcher, created on first use so importing
+    this module stays cheap (no SQLite session or data file read) for callers
+    that only need the chart helpers.
+    """
+    return NSEDataFetcher()
+
+
 # For testing
 if __name__ == "__main__":
     fetcher = NSEDataFetcher()
@@ -4,6 +4,12 @@ Email Alert System - Sends trading signal alerts via email
 
 import smtplib
 import os
+import queue
+import string
+import threading
+import time
+from concurrent.futures import Future
+from email.message import EmailMessage
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
@@ -12,6 +18,126 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Reconnect after this many messages, or when idle longer than the server
+# is likely to keep the session open
+SMTP_MAX_MESSAGES = 100
+SMTP_IDLE_TIMEOUT = 100
+# Most queued alerts delivered back to back over one session
+SMTP_BATCH_SIZE = 20
+# Seconds close() waits for queued alerts to drain; it runs at shutdown,
+# so a hung SMTP server must not stall process exit
+SMTP_CLOSE_TIMEOUT = 5
+
+# signal_type -> (emoji, action, color, description)
+_SIGNAL_META = {
+    "BUY": ("🟢", "BULLISH BREAKOUT", "#28a745",
+            "Price broke above previous day's HIGH ($trigger)"),
+    "SELL": ("🔴", "BEARISH BREAKDOWN", "#dc3545",
+             "Price broke below previous day's LOW ($trigger)"),
+}
+
+# The alert HTML is a per-signal-type head, the value rows and a constant
+# tail; they are joined into one template per signal type below
+_HEAD_TEMPLATE = string.Template("""
+<html>
+<body style="font-family: Arial, sans-serif; padding: 20px;">
+    <div style="max-width: 600px; margin: 0 auto; border: 2px solid $color; border-radius: 10px; padding: 20px;">
+        <h1 style="color: $color; text-align: center;">
+            $emoji BankNifty $signal_type Signal $emoji
+        </h1>
+
+        <div style="background-color: $color; color: white; padding: 15px; border-radius: 5px; text-align: center; margin: 20px 0;">
+            <h2 style="margin: 0;">$action</h2>
+        </div>
+
+""")
+
+_HTML_ROWS = """        <table style="width: 100%; border-collapse: collapse; margin: 20px 0;">
+            <tr style="background-color: #f8f9fa;">
+                <td style="padding: 10px; border: 1px solid #dee2e6;"><strong>Current Price</strong></td>
+                <td style="padding: 10px; border: 1px solid #dee2e6; font-size: 18px; font-weight: bold;">$price</td>
+            </tr>
+            <tr>
+                <td style="padding: 10px; border: 1px solid #dee2e6;"><strong>Trigger Level</strong></td>
+                <td style="padding: 10px; border: 1px solid #dee2e6;">$trigger</td>
+            </tr>
+            <tr style="background-color: #f8f9fa;">
+                <td style="padding: 10px; border: 1px solid #dee2e6;"><strong>Previous Day High</strong></td>
+                <td style="padding: 10px; border: 1px solid #dee2e6;">$prev_high</td>
+            </tr>
+            <tr>
+                <td style="padding: 10px; border: 1px solid #dee2e6;"><strong>Previous Day Low</strong></td>
+                <td style="padding: 10px; border: 1px solid #dee2e6;">$prev_low</td>
+            </tr>
+            <tr style="background-color: #f8f9fa;">
+                <td style="padding: 10px; border: 1px solid #dee2e6;"><strong>Signal Time</strong></td>
+                <td style="padding: 10px; border: 1px solid #dee2e6;">$time</td>
+            </tr>
+        </table>
+
+        <p style="color: #666; text-align: center; font-size: 14px;">
+            $description
+        </p>
+
+"""
+
+_HTML_TAIL = """        <hr style="border: none; border-top: 1px solid #dee2e6; margin: 20px 0;">
+
+        <p style="color: #999; font-size: 12px; text-align: center;">
+            This is an automated alert from Francis Trading App.<br>
+            Always do your own analysis before trading.
+        </p>
+    </div>
+</body>
+</html>
+"""
+
+# Plain text fallback
+_TEXT_TEMPLATE = string.Template("""
+BankNifty $signal_type Signal Alert!
+=====================================
+
+$action
+
+Current Price: $price
+Trigger Level: $trigger
+Previous Day High: $prev_high
+Previous Day Low: $prev_low
+Signal Time: $time
+
+$description
+
+---
+This is an automated alert from Francis Trading App.
+Always do your own analysis before trading.
+""")
+
+
+def _alert_templates(signal_type: str):
+    """Bake the signal-specific parts in, leaving only the per-send values"""
+    emoji, action, color, description = _SIGNAL_META[signal_type]
+    static = {"signal_type": signal_type, "action": action, "description": description}
+    head = _HEAD_TEMPLATE.substitute(static, emoji=emoji, color=color)
+    return (
+        string.Template(head + string.Template(_HTML_ROWS).safe_substitute(static) + _HTML_TAIL),
+        string.Template(_TEXT_TEMPLATE.safe_substitute(static)),
+    )
+
+
+# signal_type -> (html template, text template), each needing only
+# price/trigger/prev_high/prev_low/time
+_ALERT_TEMPLATES = {signal_type: _alert_templates(signal_type) for signal_type in _SIGNAL_META}
+
+_TEST_HTML_TEMPLATE = string.Template("""
+<html>
+<body style="font-family: Arial, sans-serif; padding: 20px;">
+    <h2>Email Configuration Test</h2>
+    <p>If you received this email, your Francis Trading App email alerts are configured correctly!</p>
+    <p>Test sent at: $time</p>
+</body>
+</html>
+""")
+
 
 class EmailAlertSystem:
     """Handles sending email alerts for trading signals"""
@@ -23,10 +149,128 @@ class EmailAlertSystem:
         self.smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
         self.smtp_port = int(os.getenv("SMTP_PORT", "587"))
         self.enabled = bool(self.sender_email and self.sender_password and self.receiver_email)
+        # Credentials are read once, so callers can check this attribute directly
+        self.configured = self.enabled
+
+        # Persistent SMTP connection, reused across alerts
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._smtp_msgs = 0
+        self._smtp_last_used = 0.0
+        self._smtp_lock = threading.Lock()
+
+        # Single worker drains queued alerts in batches over the shared connection
+        self._send_queue: queue.Queue = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
 
     def is_configured(self) -> bool:
         """Check if email is properly configured"""
-        return self.enabled
+        return self.configured
+
+    def _connect(self) -> smtplib.SMTP:
+        """Open a new STARTTLS connection and log in"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+        server.starttls()
+        server.login(self.sender_email, self.sender_password)
+        return server
+
+    def _get_conn(self) -> smtplib.SMTP:
+        """Return an authenticated connection, reusing the open one while it is healthy"""
+        if self._smtp is not None:
+            fresh = (self._smtp_msgs < SMTP_MAX_MESSAGES
+                     and time.monotonic() - self._smtp_last_used < SMTP_IDLE_TIMEOUT)
+            if fresh:
+                try:
+                    if self._smtp.noop()[0] == 250:
+                        return self._smtp
+                except (smtplib.SMTPException, OSError):
+                    pass
+            self._close_conn()
+
+        self._smtp = self._connect()
+        self._smtp_msgs = 0
+        return self._smtp
+
+    def _close_conn(self):
+        """Close the persistent connection, ignoring errors from a dead socket"""
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def _transmit(self, server: smtplib.SMTP, message) -> smtplib.SMTP:
+        """Send on server (lock held), reconnecting once if it dropped. Returns the live connection"""
+        try:
+            server.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            self._close_conn()
+            server = self._get_conn()
+            server.send_message(message)
+        self._smtp_msgs += 1
+        self._smtp_last_used = time.monotonic()
+        return server
+
+    def _send(self, build):
+        """
+        Send the message returned by build() over the persistent connection.
+        build is only called once a connection is up, so a down or misconfigured
+        server costs no rendering.
+        """
+        with self._smtp_lock:
+            server = self._get_conn()
+            self._transmit(server, build())
+
+    def _run_worker(self):
+        """Drain queued alerts, sending each batch over one SMTP session"""
+        while True:
+            item = self._send_queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < SMTP_BATCH_SIZE:
+                try:
+                    item = self._send_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._send_queue.put(None)
+                    break
+                batch.append(item)
+            self._deliver(batch)
+
+    def _deliver(self, batch):
+        """Send a batch of (future, alert args); smtplib pipelines MAIL/RCPT/DATA when the server allows"""
+        with self._smtp_lock:
+            server = None
+            for future, args in batch:
+                try:
+                    if server is None or self._smtp_msgs >= SMTP_MAX_MESSAGES:
+                        server = self._get_conn()
+                    server = self._transmit(server, self._build_alert(*args))
+                    print(f"Email alert sent successfully for {args[0]} signal")
+                    future.set_result(True)
+                except Exception as e:
+                    print(f"Failed to send email alert: {e}")
+                    server = None
+                    future.set_result(False)
+
+    def close(self):
+        """Stop the alert worker after it drains the queue, then close the SMTP connection"""
+        worker = self._worker
+        if worker is not None and worker.is_alive():
+            self._send_queue.put(None)
+            worker.join(timeout=SMTP_CLOSE_TIMEOUT)
+        self._worker = None
+        # The worker holds the lock while a batch is in flight; don't wait
+        # on it past the close timeout
+        if not self._smtp_lock.acquire(timeout=SMTP_CLOSE_TIMEOUT):
+            return
+        try:
+            self._close_conn()
+        finally:
+            self._smtp_lock.release()
 
     def send_signal_alert(self, signal_type: str, price: float, trigger_level: float,
                           prev_high: float, prev_low: float) -> bool:
@@ -48,104 +292,7 @@ class EmailAlertSystem:
             return False
 
         try:
-            subject = f"🚨 BankNifty {signal_type} Signal Alert!"
-
-            # Create HTML email body
-            if signal_type == "BUY":
-                emoji = "🟢"
-                action = "BULLISH BREAKOUT"
-                color = "#28a745"
-                description = f"Price broke above previous day's HIGH ({trigger_level:,.2f})"
-            else:
-                emoji = "🔴"
-                action = "BEARISH BREAKDOWN"
-                color = "#dc3545"
-                description = f"Price broke below previous day's LOW ({trigger_level:,.2f})"
-
-            html_body = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; padding: 20px;">
-                <div style="max-width: 600px; margin: 0 auto; border: 2px solid {color}; border-radius: 10px; padding: 20px;">
-                    <h1 style="color: {color}; text-align: center;">
-                        {emoji} BankNifty {signal_type} Signal {emoji}
-                    </h1>
-
-                    <div style="background-color: {color}; color: white; padding: 15px; border-radius: 5px; text-align: center; margin: 20px 0;">
-                        <h2 style="margin: 0;">{action}</h2>
-                    </div>
-
-                    <table style="width: 100%; border-collapse: collapse; margin: 20px 0;">
-                        <tr style="background-color: #f8f9fa;">
-                            <td style="padding: 10px; border: 1px solid #dee2e6;"><strong>Current Price</strong></td>
-                            <td style="padding: 10px; border: 1px solid #dee2e6; font-size: 18px; font-weight: bold;">{price:,.2f}</td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 10px; border: 1px solid #dee2e6;"><strong>Trigger Level</strong></td>
-                            <td style="padding: 10px; border: 1px solid #dee2e6;">{trigger_level:,.2f}</td>
-                        </tr>
-                        <tr style="background-color: #f8f9fa;">
-                            <td style="padding: 10px; border: 1px solid #dee2e6;"><strong>Previous Day High</strong></td>
-                            <td style="padding: 10px; border: 1px solid #dee2e6;">{prev_high:,.2f}</td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 10px; border: 1px solid #dee2e6;"><strong>Previous Day Low</strong></td>
-                            <td style="padding: 10px; border: 1px solid #dee2e6;">{prev_low:,.2f}</td>
-                        </tr>
-                        <tr style="background-color: #f8f9fa;">
-                            <td style="padding: 10px; border: 1px solid #dee2e6;"><strong>Signal Time</strong></td>
-                            <td style="padding: 10px; border: 1px solid #dee2e6;">{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</td>
-                        </tr>
-                    </table>
-
-                    <p style="color: #666; text-align: center; font-size: 14px;">
-                        {description}
-                    </p>
-
-                    <hr style="border: none; border-top: 1px solid #dee2e6; margin: 20px 0;">
-
-                    <p style="color: #999; font-size: 12px; text-align: center;">
-                        This is an automated alert from Francis Trading App.<br>
-                        Always do your own analysis before trading.
-                    </p>
-                </div>
-            </body>
-            </html>
-            """
-
-            # Plain text fallback
-            text_body = f"""
-            BankNifty {signal_type} Signal Alert!
-            =====================================
-
-            {action}
-
-            Current Price: {price:,.2f}
-            Trigger Level: {trigger_level:,.2f}
-            Previous Day High: {prev_high:,.2f}
-            Previous Day Low: {prev_low:,.2f}
-            Signal Time: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-
-            {description}
-
-            ---
-            This is an automated alert from Francis Trading App.
-            Always do your own analysis before trading.
-            """
-
-            # Create message
-            message = MIMEMultipart("alternative")
-            message["Subject"] = subject
-            message["From"] = self.sender_email
-            message["To"] = self.receiver_email
-
-            message.attach(MIMEText(text_body, "plain"))
-            message.attach(MIMEText(html_body, "html"))
-
-            # Send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.sender_email, self.sender_password)
-                server.send_message(message)
+            self._send(lambda: self._build_alert(signal_type, price, trigger_level, prev_high, prev_low))
 
             print(f"Email alert sent successfully for {signal_type} signal")
             return True
@@ -154,33 +301,76 @@ class EmailAlertSystem:
             print(f"Failed to send email alert: {e}")
             return False
 
+    def _build_alert(self, signal_type: str, price: float, trigger_level: float,
+                     prev_high: float, prev_low: float) -> MIMEMultipart:
+        """Render the alert message for a signal"""
+        subject = f"🚨 BankNifty {signal_type} Signal Alert!"
+
+        html_template, text_template = _ALERT_TEMPLATES[signal_type]
+        fields = {
+            "price": f"{price:,.2f}",
+            "trigger": f"{trigger_level:,.2f}",
+            "prev_high": f"{prev_high:,.2f}",
+            "prev_low": f"{prev_low:,.2f}",
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+        html_body = html_template.substitute(fields)
+        text_body = text_template.substitute(fields)
+
+        # Create message
+        message = MIMEMultipart("alternative")
+        message["Subject"] = subject
+        message["From"] = self.sender_email
+        message["To"] = self.receiver_email
+
+        message.attach(MIMEText(text_body, "plain"))
+        message.attach(MIMEText(html_body, "html"))
+        return message
+
+    def send_signal_alert_async(self, signal_type: str, price: float, trigger_level: float,
+                                prev_high: float, prev_low: float) -> Future:
+        """
+        Queue a signal alert for the background email worker and return at once.
+        The returned Future resolves to True once the alert is sent, False on failure.
+        """
+        future: Future = Future()
+        if not self.enabled:
+            print("Email not configured. Skipping alert.")
+            future.set_result(False)
+            return future
+
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run_worker, name="email-alert", daemon=True
+                )
+                self._worker.start()
+        self._send_queue.put((future, (signal_type, price, trigger_level, prev_high, prev_low)))
+        return future
+
+    def _build_test_email(self) -> EmailMessage:
+        """Render the configuration test message"""
+        subject = "Francis Trading App - Test Email"
+        body = _TEST_HTML_TEMPLATE.substitute(
+            time=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        )
+
+        # Single HTML body, so no multipart envelope
+        message = EmailMessage()
+        message["Subject"] = subject
+        message["From"] = self.sender_email
+        message["To"] = self.receiver_email
+        message.set_content(body, subtype="html")
+        return message
+
     def send_test_email(self):
         """Send a test email to verify configuration. Returns (success, error_message)"""
         if not self.enabled:
             return False, "Email not configured"
 
         try:
-            subject = "Francis Trading App - Test Email"
-            body = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; padding: 20px;">
-                <h2>Email Configuration Test</h2>
-                <p>If you received this email, your Francis Trading App email alerts are configured correctly!</p>
-                <p>Test sent at: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</p>
-            </body>
-            </html>
-            """
-
-            message = MIMEMultipart()
-            message["Subject"] = subject
-            message["From"] = self.sender_email
-            message["To"] = self.receiver_email
-            message.attach(MIMEText(body, "html"))
-
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.sender_email, self.sender_password)
-                server.send_message(message)
+            self._send(self._build_test_email)
 
             return True, None
         except Exception as e:
@@ -192,9 +382,9 @@ class EmailAlertSystem:
 # For testing
 if __name__ == "__main__":
     alert = EmailAlertSystem()
-    print(f"Email configured: {alert.is_configured()}")
+    print(f"Email configured: {alert.configured}")
 
-    if alert.is_configured():
+    if alert.configured:
         # Test sending
         alert.send_signal_alert(
             signal_type="BUY",
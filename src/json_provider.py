@@ -0,0 +1,56 @@
+"""
+JSON Provider - orjson-backed serialization for Flask responses
+"""
+
+from flask import jsonify, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes with orjson. Used by jsonify(), so
+    route handlers stay unchanged. numpy scalars/arrays and datetimes are
+    serialized natively (datetimes as ISO 8601); anything else falls back
+    to Flask's default hook.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return self._encode(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encode(obj), mimetype=self.mimetype)
+
+    def _encode(self, obj):
+        return orjson.dumps(
+            obj,
+            default=self.default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+
+
+def use_fast_json(app):
+    """Switch app to the orjson provider when orjson is installed"""
+    if ORJSON_AVAILABLE:
+        app.json = OrjsonProvider(app)
+    return app
+
+
+def conditional_jsonify(*args, **kwargs):
+    """
+    jsonify() with a content ETag. Answers 304 Not Modified when the client's
+    If-None-Match already matches, so unchanged polls carry no body.
+    """
+    response = jsonify(*args, **kwargs)
+    response.add_etag()
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
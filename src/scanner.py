@@ -2,15 +2,15 @@
 BankNifty Scanner - Runs at market open (9:15 AM) and close (3:25 PM) IST
 """
 
-from datetime import datetime
+from datetime import datetime, date
 from typing import Optional, Callable
 import time
-import pytz
+from zoneinfo import ZoneInfo
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 
-from .data_fetcher import NSEDataFetcher
+from .data_fetcher import get_default_fetcher
 from .signal_generator import SignalGenerator, Signal
 from .email_alert import EmailAlertSystem
 
@@ -22,7 +22,7 @@ class BankNiftyScanner:
     """
 
     def __init__(self, scan_interval_minutes: int = 15):
-        self.data_fetcher = NSEDataFetcher()
+        self.data_fetcher = get_default_fetcher()
         self.signal_generator = SignalGenerator()
         self.email_alert = EmailAlertSystem()
 
@@ -31,9 +31,11 @@ class BankNiftyScanner:
         self.is_running = False
         self.last_scan_time: Optional[datetime] = None
         self.current_price_data: Optional[dict] = None
+        # IST date of the last successful swing refresh
+        self._swing_refresh_date: Optional[date] = None
 
         # India timezone
-        self.ist = pytz.timezone('Asia/Kolkata')
+        self.ist = ZoneInfo("Asia/Kolkata")
 
         # Callback for signal events
         self.on_signal_callback: Optional[Callable[[Signal], None]] = None
@@ -44,9 +46,25 @@ class BankNiftyScanner:
     def _initialize_previous_day_data(self):
         """Fetch and set previous day's data on startup"""
         try:
-            df = self.data_fetcher.get_banknifty_data(days=10)
+            # Manual levels are used as-is; no DataFrame or swing search needed
+            manual_day = self.data_fetcher.get_manual_previous_day()
+            if manual_day:
+                self.signal_generator.set_previous_day_data(
+                    manual_day["High"], manual_day["Low"], manual_day["Close"], manual_day["Date"]
+                )
+                self._swing_refresh_date = datetime.now(self.ist).date()
+                return
+
+            # Swing detection needs the whole lookback window, not just the last row
+            df = self.data_fetcher.get_banknifty_data(days=self.signal_generator.lookback_days)
             if df is not None and not df.empty:
                 self.signal_generator.update_from_dataframe(df)
+                # The swing finder treats the last row as today; until the
+                # session's bar exists (pre-open boot, EOD-only fallback) the
+                # levels are provisional, so leave the next scan to recompute
+                today = datetime.now(self.ist).date()
+                if df["Date"].iloc[-1].date() == today:
+                    self._swing_refresh_date = today
                 print(f"Initialized with swing data: {self.signal_generator.swing_data}")
         except Exception as e:
             print(f"Error initializing previous day data: {e}")
@@ -59,8 +77,9 @@ class BankNiftyScanner:
         try:
             self.last_scan_time = datetime.now()
 
-            # Refresh swing data
-            self._initialize_previous_day_data()
+            # Swing levels only move day to day; refresh once per IST date
+            if self._swing_refresh_date != datetime.now(self.ist).date():
+                self._initialize_previous_day_data()
 
             # Get current price
             self.current_price_data = self.data_fetcher.get_current_price()
@@ -76,14 +95,14 @@ class BankNiftyScanner:
                 return None
 
             # Check for signal
-            signal = self.signal_generator.check_signal(current_price)
+            signal = self.signal_generator.check_signal(current_price, self.last_scan_time)
 
             if signal:
                 print(f"Signal generated: {signal.signal_type} at {signal.price}")
 
                 # Send email alert
-                if self.email_alert.is_configured():
-                    self.email_alert.send_signal_alert(
+                if self.email_alert.configured:
+                    self.email_alert.send_signal_alert_async(
                         signal_type=signal.signal_type,
                         price=signal.price,
                         trigger_level=signal.trigger_level,
@@ -155,6 +174,7 @@ class BankNiftyScanner:
             self.scheduler.shutdown(wait=False)
             self.is_running = False
             print("Scanner stopped")
+        self.email_alert.close()
 
     def get_status(self) -> dict:
         """Get current scanner status"""
@@ -171,7 +191,7 @@ class BankNiftyScanner:
             "current_price": self.current_price_data,
             "market_status": market_status,
             "previous_day_data": self.signal_generator.previous_day_data,
-            "email_configured": self.email_alert.is_configured(),
+            "email_configured": self.email_alert.configured,
             "signals_history": self.signal_generator.get_signals_history()
         }
 
@@ -2,13 +2,67 @@
 Signal Generator - Generates BUY/SELL signals based on recent swing high/low breakout
 """
 
+from collections import deque
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional, List
+import numpy as np
 import pandas as pd
 
+SIGNALS_HISTORY_SIZE = 500
+DATE_FORMAT = "%Y-%m-%d"
 
-@dataclass
+
+def _format_date(d) -> str:
+    """Format a swing date as YYYY-MM-DD"""
+    if hasattr(d, "strftime"):
+        return d.strftime(DATE_FORMAT)
+    return str(d)[:10]
+
+
+def _recent_swing_indices(highs: np.ndarray, lows: np.ndarray, lookback: int):
+    """
+    Return (high_idx, low_idx) of the most recent swing high and swing low,
+    falling back to the highest high / lowest low of the lookback window
+    (excluding the last candle); -1 when neither exists. Scalars in, scalars
+    out, so the DataFrame and date handling stay with the caller.
+    """
+    # Swing High: high > previous high AND high > next high (interior candles only);
+    # Swing Low: low < previous low AND low < next low
+    mid_highs = highs[1:-1]
+    mid_lows = lows[1:-1]
+    swing_high_idx = np.flatnonzero((mid_highs > highs[:-2]) & (mid_highs > highs[2:]))
+    swing_low_idx = np.flatnonzero((mid_lows < lows[:-2]) & (mid_lows < lows[2:]))
+
+    # Fallback window: the lookback period excluding today
+    n = len(highs)
+    start = n - lookback if n > lookback else 0
+    end = n - 1
+
+    # NaN bars (NSE coerces bad values to NaN) never count in the fallback,
+    # matching idxmax/idxmin; an all-NaN window has no fallback
+    window_highs = highs[start:end]
+    window_lows = lows[start:end]
+
+    # Take the most recent swing (+1 undoes the interior offset)
+    if len(swing_high_idx):
+        high_idx = int(swing_high_idx[-1]) + 1
+    elif len(window_highs) and not np.isnan(window_highs).all():
+        high_idx = start + int(np.nanargmax(window_highs))
+    else:
+        high_idx = -1
+
+    if len(swing_low_idx):
+        low_idx = int(swing_low_idx[-1]) + 1
+    elif len(window_lows) and not np.isnan(window_lows).all():
+        low_idx = start + int(np.nanargmin(window_lows))
+    else:
+        low_idx = -1
+
+    return high_idx, low_idx
+
+
+@dataclass(slots=True, frozen=True)
 class Signal:
     """Trading signal data class"""
     signal_type: str  # "BUY" or "SELL"
@@ -19,21 +73,25 @@ class Signal:
     swing_low: float
     swing_high_date: str
     swing_low_date: str
+    # Memoized to_dict() result; fields are frozen so it never goes stale
+    _dict: Optional[dict] = field(default=None, init=False, repr=False, compare=False)
 
     def to_dict(self):
-        return {
-            "signal_type": self.signal_type,
-            "price": self.price,
-            "trigger_level": self.trigger_level,
-            "timestamp": self.timestamp.isoformat(),
-            "swing_high": self.swing_high,
-            "swing_low": self.swing_low,
-            "swing_high_date": self.swing_high_date,
-            "swing_low_date": self.swing_low_date,
-            # For backward compatibility
-            "previous_day_high": self.swing_high,
-            "previous_day_low": self.swing_low
-        }
+        if self._dict is None:
+            object.__setattr__(self, "_dict", {
+                "signal_type": self.signal_type,
+                "price": self.price,
+                "trigger_level": self.trigger_level,
+                "timestamp": self.timestamp.isoformat(),
+                "swing_high": self.swing_high,
+                "swing_low": self.swing_low,
+                "swing_high_date": self.swing_high_date,
+                "swing_low_date": self.swing_low_date,
+                # For backward compatibility
+                "previous_day_high": self.swing_high,
+                "previous_day_low": self.swing_low
+            })
+        return self._dict
 
 
 class SignalGenerator:
@@ -48,12 +106,40 @@ class SignalGenerator:
     - SELL signal: When current price breaks below recent swing LOW
     """
 
+    __slots__ = (
+        "lookback_days", "signals_history", "last_signal", "daily_data",
+        "_swing_data", "_swing_high", "_swing_low", "_swing_date_label",
+        "_frame_swing", "_history_dicts_cache",
+    )
+
     def __init__(self, lookback_days: int = 10):
         self.lookback_days = lookback_days
-        self.signals_history: List[Signal] = []
+        self.signals_history: deque = deque(maxlen=SIGNALS_HISTORY_SIZE)
         self.last_signal: Optional[Signal] = None
         self.swing_data: Optional[dict] = None
         self.daily_data: Optional[pd.DataFrame] = None
+        # (frame fingerprint, swing dict it produced) from the last update_from_dataframe
+        self._frame_swing: Optional[tuple] = None
+        # Serialized signals_history, rebuilt only after a new signal
+        self._history_dicts_cache: Optional[List[dict]] = None
+
+    @property
+    def swing_data(self) -> Optional[dict]:
+        return self._swing_data
+
+    @swing_data.setter
+    def swing_data(self, data: Optional[dict]):
+        self._swing_data = data
+        # Levels as plain floats for check_signal's per-tick range test
+        if data:
+            self._swing_high = float(data["swing_high"])
+            self._swing_low = float(data["swing_low"])
+        else:
+            self._swing_high = self._swing_low = None
+        # Status label is polled far more often than the levels change
+        self._swing_date_label = (
+            f"High: {data['swing_high_date']}, Low: {data['swing_low_date']}" if data else None
+        )
 
     def set_swing_levels(self, swing_high: float, swing_low: float,
                          high_date: str = "", low_date: str = ""):
@@ -77,76 +163,45 @@ class SignalGenerator:
         if df is None or len(df) < 3:
             return None
 
-        df = df.sort_values("Date").reset_index(drop=True)
-
-        swing_highs = []
-        swing_lows = []
-
-        # Find all swing points (need at least 1 candle before and after)
-        for i in range(1, len(df) - 1):
-            current = df.iloc[i]
-            prev_candle = df.iloc[i - 1]
-            next_candle = df.iloc[i + 1]
-
-            # Swing High: current high > previous high AND current high > next high
-            if current["High"] > prev_candle["High"] and current["High"] > next_candle["High"]:
-                swing_highs.append({
-                    "price": float(current["High"]),
-                    "date": current["Date"],
-                    "index": i
-                })
-
-            # Swing Low: current low < previous low AND current low < next low
-            if current["Low"] < prev_candle["Low"] and current["Low"] < next_candle["Low"]:
-                swing_lows.append({
-                    "price": float(current["Low"]),
-                    "date": current["Date"],
-                    "index": i
-                })
-
-        # Get the most recent swing high and low
-        # If no swing points found, use the highest high and lowest low from recent data
-        if swing_highs:
-            recent_swing_high = swing_highs[-1]  # Most recent
-        else:
-            # Fallback: highest high in the lookback period (exclude today)
-            recent_data = df.iloc[-self.lookback_days:-1] if len(df) > self.lookback_days else df.iloc[:-1]
-            if len(recent_data) > 0:
-                max_idx = recent_data["High"].idxmax()
-                recent_swing_high = {
-                    "price": float(recent_data.loc[max_idx, "High"]),
-                    "date": recent_data.loc[max_idx, "Date"],
-                    "index": max_idx
-                }
-            else:
-                return None
-
-        if swing_lows:
-            recent_swing_low = swing_lows[-1]  # Most recent
+        # Fetchers already return ascending dates; everything below is positional,
+        # so an unsorted frame only needs reordering, not a new index
+        if not df["Date"].is_monotonic_increasing:
+            df = df.sort_values("Date")
+
+        return self.find_swing_points_arrays(
+            np.ascontiguousarray(df["High"].to_numpy(dtype=np.float64)),
+            np.ascontiguousarray(df["Low"].to_numpy(dtype=np.float64)),
+            df["Date"].to_numpy()
+        )
+
+    def find_swing_points_arrays(self, highs: np.ndarray, lows: np.ndarray,
+                                 dates: np.ndarray) -> Optional[dict]:
+        """
+        find_swing_points on date-ordered High/Low/Date arrays, skipping the
+        DataFrame entirely. highs and lows should be float64.
+        """
+        if len(highs) < 3:
+            return None
+
+        high_idx, low_idx = _recent_swing_indices(highs, lows, self.lookback_days)
+        if high_idx < 0 or low_idx < 0:
+            return None
+
+        # Format only the two chosen dates; naive datetime64 columns (both
+        # fetchers) go through numpy in one call
+        if dates.dtype.kind == "M":
+            high_date, low_date = np.datetime_as_string(
+                dates[[high_idx, low_idx]], unit="D"
+            ).tolist()
         else:
-            # Fallback: lowest low in the lookback period (exclude today)
-            recent_data = df.iloc[-self.lookback_days:-1] if len(df) > self.lookback_days else df.iloc[:-1]
-            if len(recent_data) > 0:
-                min_idx = recent_data["Low"].idxmin()
-                recent_swing_low = {
-                    "price": float(recent_data.loc[min_idx, "Low"]),
-                    "date": recent_data.loc[min_idx, "Date"],
-                    "index": min_idx
-                }
-            else:
-                return None
-
-        # Format dates
-        def format_date(d):
-            if hasattr(d, "strftime"):
-                return d.strftime("%Y-%m-%d")
-            return str(d)[:10]
+            high_date = _format_date(dates[high_idx])
+            low_date = _format_date(dates[low_idx])
 
         return {
-            "swing_high": recent_swing_high["price"],
-            "swing_low": recent_swing_low["price"],
-            "swing_high_date": format_date(recent_swing_high["date"]),
-            "swing_low_date": format_date(recent_swing_low["date"])
+            "swing_high": float(highs[high_idx]),
+            "swing_low": float(lows[low_idx]),
+            "swing_high_date": high_date,
+            "swing_low_date": low_date
         }
 
     def update_from_dataframe(self, df: pd.DataFrame):
@@ -154,11 +209,21 @@ class SignalGenerator:
         if df is None or df.empty:
             return False
 
-        self.daily_data = df.copy()
+        # Same latest candle as last time -> same swings; the last row is part
+        # of the key because its high/low decide the newest swing point
+        key = (len(df), df["Date"].iat[-1], df["High"].iat[-1], df["Low"].iat[-1])
+        if self._frame_swing is not None:
+            cached_key, cached_points = self._frame_swing
+            if cached_key == key and self.swing_data is cached_points:
+                return True
+
+        # Read-only here, so keep a reference rather than copying the frame
+        self.daily_data = df
         swing_points = self.find_swing_points(df)
 
         if swing_points:
             self.swing_data = swing_points
+            self._frame_swing = (key, swing_points)
             print(f"Swing High: {swing_points['swing_high']} ({swing_points['swing_high_date']})")
             print(f"Swing Low: {swing_points['swing_low']} ({swing_points['swing_low_date']})")
             return True
@@ -168,7 +233,7 @@ class SignalGenerator:
     # Backward compatibility
     def set_previous_day_data(self, high: float, low: float, close: float, date: datetime):
         """Set swing levels (backward compatible method)"""
-        date_str = date.strftime("%Y-%m-%d") if hasattr(date, "strftime") else str(date)
+        date_str = date.strftime(DATE_FORMAT) if hasattr(date, "strftime") else str(date)
         self.swing_data = {
             "swing_high": high,
             "swing_low": low,
@@ -188,65 +253,85 @@ class SignalGenerator:
             }
         return None
 
-    def check_signal(self, current_price: float) -> Optional[Signal]:
+    def check_signal(self, current_price: float,
+                     timestamp: Optional[datetime] = None) -> Optional[Signal]:
         """
         Check if current price triggers a BUY or SELL signal.
 
         Args:
             current_price: Current BankNifty price
+            timestamp: Time to stamp on a new signal; callers that already
+                sampled the clock pass it in, otherwise datetime.now()
 
         Returns:
             Signal object if a signal is triggered, None otherwise
         """
-        if self.swing_data is None:
+        swing_low = self._swing_low
+        if swing_low is None:
             return None
+        swing_high = self._swing_high
 
-        swing_high = self.swing_data["swing_high"]
-        swing_low = self.swing_data["swing_low"]
-
-        signal = None
+        # Common case: price inside the swing range, nothing to build
+        if swing_low <= current_price <= swing_high:
+            return None
 
         # BUY Signal: Price breaks above recent swing high
+        # SELL Signal: Price breaks below recent swing low
         if current_price > swing_high:
-            if self.last_signal is None or self.last_signal.signal_type != "BUY":
-                signal = Signal(
-                    signal_type="BUY",
-                    price=current_price,
-                    trigger_level=swing_high,
-                    timestamp=datetime.now(),
-                    swing_high=swing_high,
-                    swing_low=swing_low,
-                    swing_high_date=self.swing_data["swing_high_date"],
-                    swing_low_date=self.swing_data["swing_low_date"]
-                )
+            signal_type, trigger_level = "BUY", swing_high
+        else:
+            signal_type, trigger_level = "SELL", swing_low
 
-        # SELL Signal: Price breaks below recent swing low
-        elif current_price < swing_low:
-            if self.last_signal is None or self.last_signal.signal_type != "SELL":
-                signal = Signal(
-                    signal_type="SELL",
-                    price=current_price,
-                    trigger_level=swing_low,
-                    timestamp=datetime.now(),
-                    swing_high=swing_high,
-                    swing_low=swing_low,
-                    swing_high_date=self.swing_data["swing_high_date"],
-                    swing_low_date=self.swing_data["swing_low_date"]
-                )
-
-        if signal:
-            self.last_signal = signal
-            self.signals_history.append(signal)
+        last_signal = self.last_signal
+        if last_signal is not None and last_signal.signal_type == signal_type:
+            return None
+
+        signal = Signal(
+            signal_type=signal_type,
+            price=current_price,
+            trigger_level=trigger_level,
+            timestamp=timestamp or datetime.now(),
+            swing_high=swing_high,
+            swing_low=swing_low,
+            swing_high_date=self._swing_data["swing_high_date"],
+            swing_low_date=self._swing_data["swing_low_date"]
+        )
+        self.last_signal = signal
+        self.signals_history.append(signal)
+        self._history_dicts_cache = None
 
         return signal
 
+    def check_signals_array(self, prices) -> np.ndarray:
+        """
+        Vectorized check_signal over a price series, for backtests.
+
+        Returns an int8 array with 1 where a BUY would fire, -1 for SELL and
+        0 otherwise. Like check_signal, a breakout only fires when it differs
+        from the previous signal; the series starts with no prior signal and
+        no state on the generator is changed.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        codes = np.zeros(len(prices), dtype=np.int8)
+        if self._swing_low is None:
+            return codes
+
+        zone = np.where(prices > self._swing_high, 1, np.where(prices < self._swing_low, -1, 0))
+        breakout_idx = np.flatnonzero(zone)
+        breakouts = zone[breakout_idx]
+        # A breakout repeats the last signal when it matches the previous breakout
+        fires = breakouts != np.concatenate(([0], breakouts[:-1]))
+        codes[breakout_idx[fires]] = breakouts[fires]
+        return codes
+
     def get_market_status(self, current_price: float) -> dict:
         """Get current market status relative to swing levels"""
-        if self.swing_data is None:
+        swing_data = self._swing_data
+        if swing_data is None:
             return {"status": "NO_DATA"}
 
-        swing_high = self.swing_data["swing_high"]
-        swing_low = self.swing_data["swing_low"]
+        swing_high = swing_data["swing_high"]
+        swing_low = swing_data["swing_low"]
 
         if current_price > swing_high:
             status = "ABOVE_SWING_HIGH"
@@ -266,20 +351,24 @@ class SignalGenerator:
             "previous_low": swing_low,    # For UI compatibility
             "swing_high": swing_high,
             "swing_low": swing_low,
-            "swing_high_date": self.swing_data["swing_high_date"],
-            "swing_low_date": self.swing_data["swing_low_date"],
+            "swing_high_date": swing_data["swing_high_date"],
+            "swing_low_date": swing_data["swing_low_date"],
             "distance_to_high": swing_high - current_price,
             "distance_to_low": current_price - swing_low,
-            "previous_day_date": f"High: {self.swing_data['swing_high_date']}, Low: {self.swing_data['swing_low_date']}"
+            "previous_day_date": self._swing_date_label
         }
 
     def get_signals_history(self, limit: int = 50) -> List[dict]:
         """Get recent signals history"""
-        return [s.to_dict() for s in self.signals_history[-limit:]]
+        if self._history_dicts_cache is None:
+            self._history_dicts_cache = [s.to_dict() for s in self.signals_history]
+        history = self._history_dicts_cache
+        return history[max(0, len(history) - limit):]
 
     def clear_history(self):
         """Clear signals history"""
-        self.signals_history = []
+        self.signals_history.clear()
+        self._history_dicts_cache = None
         self.last_signal = None
 
 
@@ -312,3 +401,17 @@ if __name__ == "__main__":
 
     print("\nMarket Status at 51700:")
     print(generator.get_market_status(51700))
+
+    # Regression: NaN bars must not become the fallback swing level
+    nan_df = pd.DataFrame({
+        "Date": pd.date_range("2026-01-01", periods=5),
+        "High": [100, 101, float("nan"), 103, 104],
+        "Low": [90, 91, float("nan"), 93, 94]
+    })
+    nan_swings = SignalGenerator(lookback_days=10).find_swing_points(nan_df)
+    assert nan_swings["swing_high"] == 103.0, nan_swings
+    assert nan_swings["swing_high_date"] == "2026-01-04", nan_swings
+    assert nan_swings["swing_low"] == 90.0, nan_swings
+    all_nan = nan_df.assign(High=float("nan"), Low=float("nan"))
+    assert SignalGenerator().find_swing_points(all_nan) is None
+    print("\nNaN fallback check passed")
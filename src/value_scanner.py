@@ -12,6 +12,29 @@ import requests
 import json
 import time
 import random
+import functools
+from operator import itemgetter, ge, le, gt, lt
+
+from .data_fetcher import (
+    YAHOO_CHART_URL, YAHOO_POOL_SIZE, QUOTE_TTL, HISTORY_TTL,
+    YAHOO_SESSION, json_loads, ttl_cached
+)
+
+# (interval, range) per RSI timeframe: daily, weekly, monthly
+RSI_TIMEFRAMES = (("1d", "6mo"), ("1wk", "1y"), ("1mo", "2y"))
+# One worker per pooled Yahoo connection, so no request waits on or
+# discards a connection
+MAX_SCAN_WORKERS = YAHOO_POOL_SIZE
+
+# Yahoo chart quote fields and the DataFrame columns they map to
+CHART_FIELDS = ("open", "high", "low", "close", "volume")
+CHART_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+CLOSE = CHART_COLUMNS.index("Close")
+
+# How long a chart is reused per interval. Every interval carries the
+# in-progress bar, so even weekly/monthly data is only held for one scan
+# window; daily also supplies the LTP, so it stays at quote freshness.
+CHART_TTL = {"1d": QUOTE_TTL, "1wk": HISTORY_TTL, "1mo": HISTORY_TTL}
 
 # NSE India stocks list (top 15 stocks for Render free tier - 30sec timeout)
 NSE_STOCKS = [
@@ -21,38 +44,69 @@ NSE_STOCKS = [
 
 
 def calculate_rsi(prices, period=14):
-    """Calculate RSI for a price series"""
+    """Calculate RSI for the latest bar of a price series"""
     if len(prices) < period + 1:
         return None
 
-    delta = prices.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    # Only the last `period` moves feed the final value (simple-average RSI),
+    # so those closes are an exact memo key
+    tail = np.asarray(prices, dtype=np.float64)[-(period + 1):]
+    return _rsi_from_tail(tail.tobytes(), period)
 
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
 
-    return rsi.iloc[-1] if not pd.isna(rsi.iloc[-1]) else None
+@functools.lru_cache(maxsize=4096)
+def _rsi_from_tail(tail_bytes, period):
+    """RSI from the packed last period + 1 closes"""
+    # NaN moves count as zero, as with the pandas where() formulation
+    delta = np.diff(np.frombuffer(tail_bytes, dtype=np.float64))
+    gain = np.where(delta > 0, delta, 0.0).sum() / period
+    loss = np.where(delta < 0, -delta, 0.0).sum() / period
+
+    if loss == 0:
+        return 100.0 if gain > 0 else None
+    return 100 - (100 / (1 + gain / loss))
 
 
 def get_yahoo_chart_data(symbol, interval="1d", range_period="6mo"):
+    """Fetch chart data as an OHLCV DataFrame indexed by bar time"""
+    chart = get_yahoo_bars(symbol, interval, range_period)
+    if chart is None:
+        return None
+
+    timestamps, bars = chart
+    return pd.DataFrame(bars, columns=CHART_COLUMNS, index=pd.to_datetime(timestamps, unit='s'))
+
+
+def get_yahoo_bars(symbol, interval="1d", range_period="6mo"):
+    """
+    Fetch chart bars through the process-wide TTL cache, as a
+    (timestamps, bars) pair: epoch seconds and an (n, 5) float64 array in
+    CHART_COLUMNS order. The scanner only needs closes and the last two
+    bars, so this skips building a DatetimeIndex and DataFrame.
+    """
+    return ttl_cached(
+        ("value_chart", symbol, interval, range_period), CHART_TTL.get(interval, QUOTE_TTL),
+        lambda: _fetch_yahoo_bars(symbol, interval, range_period)
+    )
+
+
+def _fetch_yahoo_bars(symbol, interval, range_period):
     """Fetch data directly from Yahoo Finance chart API"""
     try:
         ticker = f"{symbol}.NS"
-        url = f"https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
+        url = f"{YAHOO_CHART_URL}/{ticker}"
         params = {
             "interval": interval,
             "range": range_period,
         }
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
-        }
 
-        response = requests.get(url, params=params, headers=headers, timeout=5)
+        # Shared keep-alive session: one TLS handshake per pooled connection
+        # rather than one per symbol and timeframe
+        response = YAHOO_SESSION.get(url, params=params, timeout=5)
         if response.status_code != 200:
             return None
 
-        data = response.json()
+        data = json_loads(response.content)
         result = data.get("chart", {}).get("result", [])
         if not result:
             return None
@@ -64,17 +118,15 @@ def get_yahoo_chart_data(symbol, interval="1d", range_period="6mo"):
         if not timestamps or not quote:
             return None
 
-        df = pd.DataFrame({
-            "Open": quote.get("open", []),
-            "High": quote.get("high", []),
-            "Low": quote.get("low", []),
-            "Close": quote.get("close", []),
-            "Volume": quote.get("volume", [])
-        }, index=pd.to_datetime(timestamps, unit='s'))
+        # One float64 block; Yahoo's null padding becomes NaN on conversion
+        ohlcv = np.array([quote.get(key, []) for key in CHART_FIELDS], dtype=np.float64)
 
-        # Remove NaN rows
-        df = df.dropna()
-        return df
+        # Remove NaN rows (bars with any missing field)
+        mask = ~np.isnan(ohlcv).any(axis=0)
+        if not mask.any():
+            return None
+        # Transposed view: one row per bar, each column contiguous
+        return np.asarray(timestamps, dtype=np.int64)[mask], ohlcv[:, mask].T
 
     except Exception as e:
         return None
@@ -82,44 +134,51 @@ def get_yahoo_chart_data(symbol, interval="1d", range_period="6mo"):
 
 def get_stock_data_yahoo(symbol, period="6mo"):
     """Fetch stock data from Yahoo Finance using direct API calls"""
-    import warnings
-    warnings.filterwarnings('ignore')
+    # No delay - speed is critical for Render timeout
+    daily = get_yahoo_bars(symbol, "1d", period)
+    if daily is None:
+        return None
 
-    try:
-        # No delay - speed is critical for Render timeout
+    # Weekly/monthly data for weekly and monthly RSI
+    weekly = get_yahoo_bars(symbol, *RSI_TIMEFRAMES[1])
+    monthly = get_yahoo_bars(symbol, *RSI_TIMEFRAMES[2])
+
+    return build_stock_data_yahoo(symbol, daily, weekly, monthly)
 
-        # Get daily data
-        daily_data = get_yahoo_chart_data(symbol, "1d", period)
-        if daily_data is None or daily_data.empty:
-            return None
 
-        # Get weekly data for weekly RSI
-        weekly_data = get_yahoo_chart_data(symbol, "1wk", "1y")
+def build_stock_data_yahoo(symbol, daily, weekly, monthly):
+    """Build the scanner row for symbol from its daily/weekly/monthly get_yahoo_bars charts"""
+    import warnings
+    warnings.filterwarnings('ignore')
 
-        # Get monthly data for monthly RSI
-        monthly_data = get_yahoo_chart_data(symbol, "1mo", "2y")
+    if daily is None:
+        return None
 
+    try:
         # Calculate RSI values
-        daily_rsi = calculate_rsi(daily_data['Close'], 14)
-        weekly_rsi = calculate_rsi(weekly_data['Close'], 14) if weekly_data is not None and not weekly_data.empty else None
-        monthly_rsi = calculate_rsi(monthly_data['Close'], 14) if monthly_data is not None and not monthly_data.empty else None
+        bars = daily[1]
+        daily_rsi = calculate_rsi(bars[:, CLOSE], 14)
+        weekly_rsi = calculate_rsi(weekly[1][:, CLOSE], 14) if weekly is not None else None
+        monthly_rsi = calculate_rsi(monthly[1][:, CLOSE], 14) if monthly is not None else None
 
         # Get latest price info
-        latest = daily_data.iloc[-1]
-        prev_close = daily_data.iloc[-2]['Close'] if len(daily_data) > 1 else latest['Close']
-        change_pct = ((latest['Close'] - prev_close) / prev_close) * 100
+        open_, high, low, close, volume = bars[-1].tolist()
+        prev_close = float(bars[-2, CLOSE]) if len(bars) > 1 else close
+        change_pct = ((close - prev_close) / prev_close) * 100
 
+        # calculate_rsi never returns NaN, so only None (and the existing
+        # falsy-zero case) needs handling; x != x is the NaN test for volume
         return {
             "symbol": symbol,
-            "ltp": round(float(latest['Close']), 2),
-            "open": round(float(latest['Open']), 2),
-            "high": round(float(latest['High']), 2),
-            "low": round(float(latest['Low']), 2),
-            "volume": int(latest['Volume']) if pd.notna(latest['Volume']) else 0,
-            "change": round(float(change_pct), 2),
-            "dailyRsi": round(float(daily_rsi), 2) if daily_rsi and not pd.isna(daily_rsi) else None,
-            "weeklyRsi": round(float(weekly_rsi), 2) if weekly_rsi and not pd.isna(weekly_rsi) else None,
-            "monthlyRsi": round(float(monthly_rsi), 2) if monthly_rsi and not pd.isna(monthly_rsi) else None,
+            "ltp": round(close, 2),
+            "open": round(open_, 2),
+            "high": round(high, 2),
+            "low": round(low, 2),
+            "volume": int(volume) if volume == volume else 0,
+            "change": round(change_pct, 2),
+            "dailyRsi": round(float(daily_rsi), 2) if daily_rsi else None,
+            "weeklyRsi": round(float(weekly_rsi), 2) if weekly_rsi else None,
+            "monthlyRsi": round(float(monthly_rsi), 2) if monthly_rsi else None,
             "source": "yahoo"
         }
     except Exception as e:
@@ -146,7 +205,7 @@ def get_stock_data_nse(symbol):
         response = session.get(url, headers=headers, timeout=10)
 
         if response.status_code == 200:
-            data = response.json()
+            data = json_loads(response.content)
             price_info = data.get("priceInfo", {})
 
             return {
@@ -201,64 +260,114 @@ def scan_stocks(conditions, stock_list=None, segment="cash"):
     if stock_list is None:
         stock_list = NSE_STOCKS
 
-    results = []
+    compiled = compile_conditions(conditions)
 
-    # Fetch data in parallel (increased workers for faster scanning)
-    with ThreadPoolExecutor(max_workers=15) as executor:
-        future_to_symbol = {executor.submit(get_stock_data, symbol): symbol for symbol in stock_list}
+    # Fetch every symbol x timeframe chart from one flat pool, so a symbol
+    # costs one round trip rather than three sequential ones
+    workers = min(MAX_SCAN_WORKERS, len(stock_list) * len(RSI_TIMEFRAMES)) or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        future_to_chart = {
+            executor.submit(get_yahoo_bars, symbol, interval, range_period): (symbol, i)
+            for symbol in stock_list
+            for i, (interval, range_period) in enumerate(RSI_TIMEFRAMES)
+        }
+        charts = {symbol: [None] * len(RSI_TIMEFRAMES) for symbol in stock_list}
+        for future in as_completed(future_to_chart):
+            symbol, i = future_to_chart[future]
+            try:
+                charts[symbol][i] = future.result()
+            except Exception as e:
+                print(f"Error processing {symbol}: {e}")
+
+        # Symbols without Yahoo daily data fall back to NSE
+        stocks = {}
+        future_to_symbol = {}
+        for symbol in stock_list:
+            try:
+                stock_data = build_stock_data_yahoo(symbol, *charts[symbol])
+            except Exception as e:
+                print(f"Error processing {symbol}: {e}")
+                continue
+            if stock_data is None:
+                future_to_symbol[executor.submit(get_stock_data_nse, symbol)] = symbol
+            else:
+                stocks[symbol] = stock_data
 
         for future in as_completed(future_to_symbol):
             symbol = future_to_symbol[future]
             try:
-                stock_data = future.result()
-                if stock_data:
-                    # Check if stock passes all active conditions
-                    if check_conditions(stock_data, conditions):
-                        stock_data['volumeFormatted'] = format_volume(stock_data['volume'])
-                        results.append(stock_data)
+                stocks[symbol] = future.result()
             except Exception as e:
                 print(f"Error processing {symbol}: {e}")
 
+    # (daily RSI, row) pairs; the sort key is taken while filtering, and
+    # missing RSI ranks as 0 without touching the row itself
+    ranked = []
+    for symbol, stock_data in stocks.items():
+        # A malformed row (e.g. a null NSE volume) skips that stock only
+        try:
+            # Check if stock passes all active conditions
+            if stock_data and check_conditions(stock_data, compiled):
+                stock_data['volumeFormatted'] = format_volume(stock_data['volume'])
+                ranked.append((stock_data.get('dailyRsi') or 0, stock_data))
+        except Exception as e:
+            print(f"Error processing {symbol}: {e}")
+
     # Sort by daily RSI descending
-    results.sort(key=lambda x: x.get('dailyRsi') or 0, reverse=True)
+    ranked.sort(key=itemgetter(0), reverse=True)
+    return [stock_data for _, stock_data in ranked]
+
+
+# Condition operator phrases, checked in order (">=" must win over ">")
+_OPERATORS = (
+    (("greater than equal", ">="), ge),
+    (("less than equal", "<="), le),
+    (("greater than", ">"), gt),
+    (("less than", "<"), lt),
+    (("equal", "=="), lambda indicator_value, value: abs(indicator_value - value) < 0.01),
+)
 
-    return results
+RSI_FIELDS = {"Daily": "dailyRsi", "Weekly": "weeklyRsi", "Monthly": "monthlyRsi"}
+INDICATOR_FIELDS = {"close": "ltp", "volume": "volume"}
+
+
+def _compare_fn(operator):
+    """Resolve an operator phrase to a comparison function"""
+    op = operator.lower()
+    for phrases, compare in _OPERATORS:
+        if any(phrase in op for phrase in phrases):
+            return compare
+    return lambda indicator_value, value: True
 
 
-def check_conditions(stock_data, conditions):
-    """Check if stock passes all active conditions"""
+def compile_conditions(conditions):
+    """
+    Parse active conditions once into (stock field, compare, value) tuples.
+    An unknown indicator compiles to a None field, which always fails.
+    """
+    compiled = []
     for cond in conditions:
         if not cond.get('active', True):
             continue
 
-        timeframe = cond.get('timeframe', 'Daily')
-        indicator = cond.get('indicator', 'Rsi')
-        operator = cond.get('operator', 'Greater than equal to')
-        value = float(cond.get('value', 0))
-
-        # Get the indicator value based on timeframe
-        if indicator.lower() == 'rsi':
-            if timeframe == 'Daily':
-                indicator_value = stock_data.get('dailyRsi')
-            elif timeframe == 'Weekly':
-                indicator_value = stock_data.get('weeklyRsi')
-            elif timeframe == 'Monthly':
-                indicator_value = stock_data.get('monthlyRsi')
-            else:
-                indicator_value = stock_data.get('dailyRsi')
-        elif indicator.lower() == 'close':
-            indicator_value = stock_data.get('ltp')
-        elif indicator.lower() == 'volume':
-            indicator_value = stock_data.get('volume')
+        indicator = cond.get('indicator', 'Rsi').lower()
+        if indicator == 'rsi':
+            field = RSI_FIELDS.get(cond.get('timeframe', 'Daily'), 'dailyRsi')
         else:
-            indicator_value = None
+            field = INDICATOR_FIELDS.get(indicator)
+
+        compare = _compare_fn(cond.get('operator', 'Greater than equal to'))
+        compiled.append((field, compare, float(cond.get('value', 0))))
+    return compiled
 
-        # If indicator value is None, condition fails
-        if indicator_value is None:
-            return False
 
-        # Check the condition
-        if not evaluate_condition(indicator_value, operator, value):
+def check_conditions(stock_data, compiled):
+    """Check if stock passes all compiled conditions"""
+    for field, compare, value in compiled:
+        indicator_value = stock_data.get(field)
+
+        # If indicator value is None, condition fails
+        if indicator_value is None or not compare(indicator_value, value):
             return False
 
     return True
@@ -266,20 +375,7 @@ def check_conditions(stock_data, conditions):
 
 def evaluate_condition(indicator_value, operator, value):
     """Evaluate a single condition"""
-    op = operator.lower()
-
-    if 'greater than equal' in op or '>=' in op:
-        return indicator_value >= value
-    elif 'less than equal' in op or '<=' in op:
-        return indicator_value <= value
-    elif 'greater than' in op or '>' in op:
-        return indicator_value > value
-    elif 'less than' in op or '<' in op:
-        return indicator_value < value
-    elif 'equal' in op or '==' in op:
-        return abs(indicator_value - value) < 0.01
-
-    return True
+    return _compare_fn(operator)(indicator_value, value)
 
 
 # Quick test